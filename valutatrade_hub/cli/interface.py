@@ -1,10 +1,13 @@
 import json
+import os
 import shlex
+import stat
 import sys
+import tempfile
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from ..core.currencies import CurrencyNotFoundError, get_all_currencies
+from ..core.currencies import AVAILABLE_CURRENCIES_CSV, CurrencyNotFoundError
 from ..core.exceptions import InsufficientFundsError
 
 # Импорты из нашей системы
@@ -18,102 +21,387 @@ class CLIState:
     def __init__(self):
         self.current_user: Optional[User] = None
         self.data_dir = Path("data")
+        
+        # Кэш загруженных JSON-файлов (перечитываются только при изменении mtime)
+        self._users_cache: Optional[list] = None
+        self._users_mtime = 0
+        self._next_uid = 1
+        self._user_by_name: Dict[str, dict] = {}
+        self._portfolios_cache: Optional[list] = None
+        self._portfolios_mtime = 0
+        self._portfolio_idx: Dict[int, int] = {}
+        # Объект портфеля текущего пользователя для повторных show-portfolio
+        self._portfolio_view: Optional[Portfolio] = None
+        self._rates_cache: Optional[dict] = None
+        self._rates_mtime = 0
+        self._exchange_rates: Dict[Tuple[str, str], float] = {}
+        
+        # Отложенная запись портфелей (используется в интерактивном режиме)
+        self.defer_writes = False
+        self._portfolios_dirty = False
+        self._pending_writes = 0
+        self._dirty_user_ids: Set[int] = set()
+
+
+# Максимум отложенных операций до принудительной записи портфелей на диск
+MAX_PENDING_WRITES = 10
+
+# Размер буфера при записи JSON-файлов
+WRITE_BUFFER_SIZE = 65536
+
+
+# Функции для работы с данными
+def _get_mtime(path: Path) -> Optional[int]:
+    """Время изменения файла в наносекундах (None, если файла нет)."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
 
-# Функции для работы с данными (оставляем без изменений)
-def load_users(data_dir: Path) -> list:
-    """Загрузка пользователей из JSON."""
-    users_file = data_dir / "users.json"
-    if users_file.exists():
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Атомарная запись файла: сначала во временный файл, затем os.replace."""
+    # Уникальное имя: параллельные процессы не пишут в один временный файл
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix='.tmp')
+    try:
+        # Дескриптор сразу передаётся файловому объекту, который его закроет
+        with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+            f.write(data)
+        
+        # mkstemp создаёт файл с правами 0600 - сохраняем права исходного файла
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp_path, mode)
+        
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """Сериализация данных в JSON одним блоком и атомарная запись на диск."""
+    encoded = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _atomic_write(path, encoded)
+
+
+def _cache_users(state: CLIState, users: Optional[list]) -> None:
+    """Сохранение пользователей в кэш, вычисление следующего ID и индекса по имени."""
+    state._users_cache = users
+    state._next_uid = max(user['user_id'] for user in users) + 1 if users else 1
+    state._user_by_name = {user['username']: user for user in users} if users else {}
+
+
+def load_users(state: CLIState) -> list:
+    """Загрузка пользователей из JSON (с кэшированием в состоянии CLI)."""
+    users_file = state.data_dir / "users.json"
+    mtime = _get_mtime(users_file)
+    if mtime is None:
+        _cache_users(state, None)
+        return []
+    
+    if state._users_cache is None or mtime != state._users_mtime:
         with open(users_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+            _cache_users(state, json.load(f))
+        state._users_mtime = mtime
+    
+    return state._users_cache
 
 
-def save_users(data_dir: Path, users: list) -> None:
-    """Сохранение пользователей в JSON."""
-    users_file = data_dir / "users.json"
-    with open(users_file, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+def save_users(state: CLIState, users: list) -> None:
+    """Сохранение пользователей в JSON с обновлением кэша."""
+    users_file = state.data_dir / "users.json"
+    try:
+        _write_json(users_file, users)
+    except Exception:
+        # Кэш мог быть изменён до записи - сбрасываем, чтобы перечитать файл
+        _cache_users(state, None)
+        raise
+    
+    if users is not state._users_cache:
+        _cache_users(state, users)
+    state._users_mtime = _get_mtime(users_file)
 
 
-def load_portfolios(data_dir: Path) -> list:
-    """Загрузка портфелей из JSON."""
-    portfolios_file = data_dir / "portfolios.json"
-    if portfolios_file.exists():
-        with open(portfolios_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+def _drop_portfolio_view(state: CLIState) -> None:
+    """Сброс закэшированного объекта портфеля (кошельки возвращаются в пул)."""
+    if state._portfolio_view is not None:
+        state._portfolio_view.release()
+        state._portfolio_view = None
 
 
-def save_portfolios(data_dir: Path, portfolios: list) -> None:
-    """Сохранение портфелей в JSON."""
-    portfolios_file = data_dir / "portfolios.json"
-    with open(portfolios_file, 'w', encoding='utf-8') as f:
-        json.dump(portfolios, f, ensure_ascii=False, indent=2)
+def _cache_portfolios(state: CLIState, portfolios: Optional[list]) -> None:
+    """Сохранение портфелей в кэш и построение индекса user_id -> позиция."""
+    state._portfolios_cache = portfolios
+    state._portfolio_idx = {p['user_id']: i for i, p in enumerate(portfolios)} if portfolios else {}
+    _drop_portfolio_view(state)
 
 
-def load_rates(data_dir: Path) -> dict:
-    """Загрузка курсов из JSON."""
-    rates_file = data_dir / "rates.json"
+def load_portfolios(state: CLIState) -> list:
+    """Загрузка портфелей из JSON (с кэшированием в состоянии CLI)."""
+    if state._portfolios_dirty:
+        # В кэше есть незаписанные изменения - они актуальнее файла
+        return state._portfolios_cache
     
-    if rates_file.exists():
-        try:
-            with open(rates_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            # Просто возвращаем пустой словарь при ошибке
-            print(f"Предупреждение: Ошибка загрузки курсов: {e}")
-            return {}
+    portfolios_file = state.data_dir / "portfolios.json"
+    mtime = _get_mtime(portfolios_file)
+    if mtime is None:
+        _cache_portfolios(state, None)
+        return []
+    
+    if state._portfolios_cache is None or mtime != state._portfolios_mtime:
+        with open(portfolios_file, 'r', encoding='utf-8') as f:
+            _cache_portfolios(state, json.load(f))
+        state._portfolios_mtime = mtime
+    
+    return state._portfolios_cache
+
+
+def save_portfolios(state: CLIState, portfolios: list, user_id: int) -> None:
+    """
+    Сохранение портфелей с обновлением кэша.
+    
+    При отложенной записи изменения остаются в кэше и сбрасываются на диск
+    через flush_portfolios (при выходе или после MAX_PENDING_WRITES операций);
+    ошибка такой записи выводится как предупреждение, изменения ждут следующей.
+    При синхронной записи ошибка пробрасывается, а кэш сбрасывается, чтобы
+    несохранённые изменения не попали на диск позже.
+    
+    Args:
+        state: Состояние CLI
+        portfolios: Список портфелей
+        user_id: ID пользователя, чей портфель изменён
+    """
+    if portfolios is not state._portfolios_cache:
+        _cache_portfolios(state, portfolios)
     else:
+        _drop_portfolio_view(state)
+    state._portfolios_dirty = True
+    state._pending_writes += 1
+    state._dirty_user_ids.add(user_id)
+    
+    if not state.defer_writes:
+        try:
+            flush_portfolios(state)
+        except Exception:
+            _discard_pending_portfolios(state)
+            raise
+    elif state._pending_writes >= MAX_PENDING_WRITES:
+        _flush_portfolios_or_warn(state)
+
+
+def _discard_pending_portfolios(state: CLIState) -> None:
+    """Отмена незаписанных изменений: кэш сбрасывается и будет перечитан из файла."""
+    _cache_portfolios(state, None)
+    state._portfolios_dirty = False
+    state._pending_writes = 0
+    state._dirty_user_ids.clear()
+
+
+def _flush_portfolios_or_warn(state: CLIState) -> None:
+    """Запись отложенных изменений; при ошибке - предупреждение и повтор позже."""
+    try:
+        flush_portfolios(state)
+    except Exception as e:
+        # Изменения остаются в кэше; следующая попытка - через MAX_PENDING_WRITES операций или при выходе
+        state._pending_writes = 0
+        print(f"Предупреждение: не удалось сохранить портфели: {e}")
+
+
+def flush_portfolios(state: CLIState) -> None:
+    """
+    Запись отложенных изменений портфелей в JSON.
+    
+    Если файл был изменён другим процессом после загрузки, берётся его
+    актуальная версия, и в неё переносятся только портфели, изменённые
+    в этой сессии.
+    """
+    if not state._portfolios_dirty:
+        return
+    
+    portfolios_file = state.data_dir / "portfolios.json"
+    portfolios = state._portfolios_cache
+    
+    mtime = _get_mtime(portfolios_file)
+    if mtime is not None and mtime != state._portfolios_mtime:
+        with open(portfolios_file, 'r', encoding='utf-8') as f:
+            on_disk = json.load(f)
+        
+        disk_idx = {p['user_id']: i for i, p in enumerate(on_disk)}
+        for user_id in state._dirty_user_ids:
+            portfolio_data = portfolios[state._portfolio_idx[user_id]]
+            i = disk_idx.get(user_id)
+            if i is None:
+                on_disk.append(portfolio_data)
+            else:
+                on_disk[i] = portfolio_data
+        
+        portfolios = on_disk
+        _cache_portfolios(state, portfolios)
+    
+    _write_json(portfolios_file, portfolios)
+    
+    state._portfolios_mtime = _get_mtime(portfolios_file)
+    state._portfolios_dirty = False
+    state._pending_writes = 0
+    state._dirty_user_ids.clear()
+
+
+def _cache_rates(state: CLIState, rates: Optional[dict]) -> None:
+    """Сохранение курсов в кэш и построение словаря {(из, в): курс}."""
+    state._rates_cache = rates
+    exchange_rates = {}
+    if rates is not None:
+        for key, value in rates.items():
+            if key == 'source' or key == 'last_refresh':
+                continue
+            # Записи без курса пропускаются, чтобы не ломать остальные команды
+            if not isinstance(value, dict) or 'rate' not in value:
+                continue
+            from_code, sep, to_code = key.partition('_')
+            if sep:
+                exchange_rates[(from_code, to_code)] = value['rate']
+    state._exchange_rates = exchange_rates
+
+
+def load_rates(state: CLIState) -> dict:
+    """Загрузка курсов из JSON (с кэшированием в состоянии CLI)."""
+    rates_file = state.data_dir / "rates.json"
+    mtime = _get_mtime(rates_file)
+    
+    if mtime is None:
         print("Предупреждение: Файл с курсами не найден")
+        _cache_rates(state, None)
         return {}
+    
+    if state._rates_cache is not None and mtime == state._rates_mtime:
+        return state._rates_cache
+    
+    try:
+        with open(rates_file, 'r', encoding='utf-8') as f:
+            rates = json.load(f)
+    except Exception as e:
+        # Просто возвращаем пустой словарь при ошибке
+        print(f"Предупреждение: Ошибка загрузки курсов: {e}")
+        _cache_rates(state, None)
+        return {}
+    
+    _cache_rates(state, rates)
+    state._rates_mtime = mtime
+    return rates
 
 
-def get_next_user_id(users: list) -> int:
-    """Получение следующего ID пользователя."""
-    if not users:
-        return 1
-    return max(user['user_id'] for user in users) + 1
+def get_exchange_rates(state: CLIState) -> Dict[Tuple[str, str], float]:
+    """Получение курсов в формате {(из, в): курс} без служебных ключей."""
+    load_rates(state)
+    return state._exchange_rates
 
 
-def find_user_by_username(users: list, username: str) -> Optional[dict]:
-    """Поиск пользователя по имени."""
-    for user in users:
-        if user['username'] == username:
-            return user
-    return None
+def get_next_user_id(state: CLIState) -> int:
+    """Получение следующего ID пользователя (счётчик вычисляется при загрузке)."""
+    return state._next_uid
 
 
-def find_portfolio_by_user_id(portfolios: list, user_id: int) -> Optional[dict]:
-    """Поиск портфеля по ID пользователя."""
-    for portfolio in portfolios:
-        if portfolio['user_id'] == user_id:
-            return portfolio
-    return None
+def find_user_by_username(state: CLIState, username: str) -> Optional[dict]:
+    """Поиск пользователя по имени в загруженном списке."""
+    return state._user_by_name.get(username)
+
+
+def find_portfolio_index(state: CLIState, user_id: int) -> Optional[int]:
+    """Поиск позиции портфеля в загруженном списке по ID пользователя."""
+    return state._portfolio_idx.get(user_id)
+
+
+def get_portfolio_view(state: CLIState, portfolio_data: dict) -> Portfolio:
+    """Объект портфеля для вывода (переиспользуется, пока портфели не изменились)."""
+    view = state._portfolio_view
+    if view is None or view.user_id != portfolio_data['user_id']:
+        _drop_portfolio_view(state)
+        view = state._portfolio_view = Portfolio.from_dict(portfolio_data)
+    return view
 
 
 def parse_args(args: List[str]) -> Dict[str, Any]:
     """Парсинг аргументов командной строки с помощью shlex."""
-    parsed = {'command': args[0] if args else None}
+    it = iter(args)
+    parsed = {'command': next(it, None)}
     
-    i = 1
-    while i < len(args):
-        arg = args[i]
-        if arg.startswith('--'):
-            key = arg[2:]
-            if i + 1 < len(args) and not args[i + 1].startswith('--'):
-                parsed[key] = args[i + 1]
-                i += 2
-            else:
+    # Флаг, ожидающий значения (каждый токен проверяется на '--' один раз)
+    key = None
+    for arg in it:
+        if arg[:2] == '--':
+            if key is not None:
                 parsed[key] = True
-                i += 1
-        else:
-            i += 1
+            key = arg[2:]
+        elif key is not None:
+            parsed[key] = arg
+            key = None
+    
+    if key is not None:
+        parsed[key] = True
     
     return parsed
 
 
+def _fast_split(s: str) -> List[str]:
+    """
+    Быстрое разбиение строки команды на токены.
+
+    Разбивает по пробельным символам с учётом кавычек ' и ".
+    Строки с обратным слэшем или незакрытой кавычкой отдаются shlex.split.
+
+    Args:
+        s: Строка команды
+
+    Returns:
+        Список токенов
+
+    Raises:
+        ValueError: Если в строке незакрытая кавычка
+    """
+    if '\\' in s:
+        return shlex.split(s)
+
+    tokens = []
+    current = []
+    in_token = False
+    quote = None
+
+    for ch in s:
+        if quote is not None:
+            if ch == quote:
+                quote = None
+            else:
+                current.append(ch)
+        elif ch == '"' or ch == "'":
+            quote = ch
+            in_token = True
+        elif ch in ' \t\r\n':
+            if in_token:
+                tokens.append(''.join(current))
+                current = []
+                in_token = False
+        else:
+            current.append(ch)
+            in_token = True
+
+    if quote is not None:
+        # Незакрытая кавычка - shlex сформирует стандартную ошибку
+        return shlex.split(s)
+
+    if in_token:
+        tokens.append(''.join(current))
+
+    return tokens
+
+
 def print_help():
     """Вывод справки по командам."""
     print("ValutaTrade Hub - Платформа для торговли валютами")
@@ -144,10 +432,10 @@ def register_command(args: Dict[str, Any], state: CLIState):
             return
         
         # Загрузка существующих пользователей
-        users = load_users(state.data_dir)
+        users = load_users(state)
         
         # Проверка уникальности username
-        if find_user_by_username(users, username):
+        if find_user_by_username(state, username):
             print(f"Имя пользователя '{username}' уже занято")
             return
         
@@ -157,18 +445,27 @@ def register_command(args: Dict[str, Any], state: CLIState):
             return
         
         # Создание нового пользователя
-        user_id = get_next_user_id(users)
+        user_id = get_next_user_id(state)
         user = User(user_id, username, password)
         
         # Сохранение пользователя
-        users.append(user.to_dict())
-        save_users(state.data_dir, users)
+        user_data = user.to_dict()
+        users.append(user_data)
+        save_users(state, users)
+        
+        # Индекс и счётчик обновляются только после успешной записи
+        state._user_by_name[username] = user_data
+        state._next_uid = user_id + 1
         
         # Создание пустого портфеля
-        portfolios = load_portfolios(state.data_dir)
+        portfolios = load_portfolios(state)
         portfolio = Portfolio(user_id)
         portfolios.append(portfolio.to_dict())
-        save_portfolios(state.data_dir, portfolios)
+        state._portfolio_idx[user_id] = len(portfolios) - 1
+        save_portfolios(state, portfolios, user_id)
+        
+        # Новый пользователь и его портфель записываются на диск сразу
+        _flush_portfolios_or_warn(state)
         
         print(f"Пользователь '{username}' зарегистрирован (id={user_id}). Войдите: login --username {username} --password ****")
         
@@ -187,10 +484,10 @@ def login_command(args: Dict[str, Any], state: CLIState):
             return
         
         # Загрузка пользователей
-        users = load_users(state.data_dir)
+        load_users(state)
         
         # Поиск пользователя
-        user_data = find_user_by_username(users, username)
+        user_data = find_user_by_username(state, username)
         if not user_data:
             print(f"Пользователь '{username}' не найден")
             return
@@ -220,41 +517,38 @@ def show_portfolio_command(args: Dict[str, Any], state: CLIState):
             return
         
         # Загрузка портфелей
-        portfolios = load_portfolios(state.data_dir)
-        portfolio_data = find_portfolio_by_user_id(portfolios, state.current_user.user_id)
+        portfolios = load_portfolios(state)
+        portfolio_index = find_portfolio_index(state, state.current_user.user_id)
         
-        if not portfolio_data:
+        if portfolio_index is None:
             print("Портфель не найден")
             return
         
-        portfolio = Portfolio.from_dict(portfolio_data)
+        portfolio = get_portfolio_view(state, portfolios[portfolio_index])
         
         # Загрузка курсов - упрощенная версия
-        rates = load_rates(state.data_dir)
+        rates = load_rates(state)
         if not rates:
             print("Используются базовые курсы для расчета")
-            rates = {
-                'EUR_USD': {'rate': 1.08},
-                'BTC_USD': {'rate': 50000.0},
-                'ETH_USD': {'rate': 3000.0}
+            exchange_rates = {
+                ('EUR', 'USD'): 1.08,
+                ('BTC', 'USD'): 50000.0,
+                ('ETH', 'USD'): 3000.0
             }
+        else:
+            exchange_rates = get_exchange_rates(state)
         
         # Получение информации о портфеле
-        if not portfolio.wallets:
+        display_items = portfolio.get_display_items(base)
+        if not display_items:
             print("Портфель пуст")
             return
         
         print(f"Портфель пользователя '{state.current_user.username}' (база: {base}):")
         
         total_value = 0
-        exchange_rates = {}
         
-        # Преобразование курсов в удобный формат
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
-        
-        for currency_code, wallet in portfolio.wallets.items():
+        for currency_code, rate_key, wallet in display_items:
             balance = wallet.balance
             
             if currency_code == base:
@@ -263,9 +557,8 @@ def show_portfolio_command(args: Dict[str, Any], state: CLIState):
                 total_value += value_in_base
             else:
                 # Поиск курса
-                rate_key = f"{currency_code}_{base}"
-                if rate_key in exchange_rates:
-                    rate = exchange_rates[rate_key]
+                rate = exchange_rates.get(rate_key)
+                if rate is not None:
                     value_in_base = balance * rate
                     print(f"- {currency_code}: {balance:.4f} → {value_in_base:.2f} {base}")
                     total_value += value_in_base
@@ -303,49 +596,35 @@ def buy_command(args: Dict[str, Any], state: CLIState):
         # Валидация через usecases
         result = usecases.buy_currency(state.current_user.user_id, currency, amount)
         
-        # Валидация входа
-        currency = currency.upper().strip()
+        # Валидация входа (код валюты уже нормализован в usecases)
+        currency = result['currency']
         if amount <= 0:
             print("'amount' должен быть положительным числом")
             return
         
         # Загрузка данных
-        portfolios = load_portfolios(state.data_dir)
-        portfolio_data = find_portfolio_by_user_id(portfolios, state.current_user.user_id)
+        portfolios = load_portfolios(state)
+        portfolio_index = find_portfolio_index(state, state.current_user.user_id)
         
-        if not portfolio_data:
+        if portfolio_index is None:
             print("Портфель не найден")
             return
         
-        portfolio = Portfolio.from_dict(portfolio_data)
-        
-        # Получение или создание кошелька
-        wallet = portfolio.get_or_create_wallet(currency)
+        portfolio_data = portfolios[portfolio_index]
         
         # Загрузка курсов для оценочной стоимости
-        rates = load_rates(state.data_dir)
-        exchange_rates = {}
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
+        exchange_rates = get_exchange_rates(state)
         
         # Расчет оценочной стоимости
-        rate_key = f"{currency}_USD"
-        rate = exchange_rates.get(rate_key, 0)
+        rate = exchange_rates.get((currency, 'USD'), 0)
         estimated_cost = amount * rate if rate > 0 else 0
         
-        # Пополнение кошелька
-        old_balance = wallet.balance
-        wallet.deposit(amount)
+        # Пополнение кошелька (кошелёк создаётся при первой покупке)
+        old_balance = Portfolio.apply_deposit(portfolio_data, currency, amount)
+        new_balance = portfolio_data['wallets'][currency]['balance']
         
         # Сохранение изменений
-        portfolio_data = portfolio.to_dict()
-        for i, p in enumerate(portfolios):
-            if p['user_id'] == state.current_user.user_id:
-                portfolios[i] = portfolio_data
-                break
-        
-        save_portfolios(state.data_dir, portfolios)
+        save_portfolios(state, portfolios, state.current_user.user_id)
         
         # Вывод результата
         if rate > 0:
@@ -355,7 +634,7 @@ def buy_command(args: Dict[str, Any], state: CLIState):
             print(f"Покупка выполнена: {amount:.4f} {currency}")
         
         print("Изменения в портфеле:")
-        print(f"- {currency}: было {old_balance:.4f} → стало {wallet.balance:.4f}")
+        print(f"- {currency}: было {old_balance:.4f} → стало {new_balance:.4f}")
         
     except CurrencyNotFoundError as e:
         print(str(e))
@@ -391,57 +670,44 @@ def sell_command(args: Dict[str, Any], state: CLIState):
         # Валидация через usecases
         result = usecases.sell_currency(state.current_user.user_id, currency, amount)
         
-        # Валидация входа
-        currency = currency.upper().strip()
+        # Валидация входа (код валюты уже нормализован в usecases)
+        currency = result['currency']
         if amount <= 0:
             print("'amount' должен быть положительным числом")
             return
         
         # Загрузка данных
-        portfolios = load_portfolios(state.data_dir)
-        portfolio_data = find_portfolio_by_user_id(portfolios, state.current_user.user_id)
+        portfolios = load_portfolios(state)
+        portfolio_index = find_portfolio_index(state, state.current_user.user_id)
         
-        if not portfolio_data:
+        if portfolio_index is None:
             print("Портфель не найден")
             return
         
-        portfolio = Portfolio.from_dict(portfolio_data)
+        portfolio_data = portfolios[portfolio_index]
         
-        # Получение кошелька
-        wallet = portfolio.get_wallet(currency)
-        if not wallet:
+        # Проверка наличия кошелька
+        if currency not in portfolio_data['wallets']:
             print(f"У вас нет кошелька '{currency}'. Добавьте валюту: она создаётся автоматически при первой покупке.")
             return
         
         # Загрузка курсов для оценочной выручки
-        rates = load_rates(state.data_dir)
-        exchange_rates = {}
-        for key, value in rates.items():
-            if key != 'source' and key != 'last_refresh':
-                exchange_rates[key] = value['rate']
+        exchange_rates = get_exchange_rates(state)
         
         # Расчет оценочной выручки
-        rate_key = f"{currency}_USD"
-        rate = exchange_rates.get(rate_key, 0)
+        rate = exchange_rates.get((currency, 'USD'), 0)
         estimated_revenue = amount * rate if rate > 0 else 0
         
         # Снятие средств
-        old_balance = wallet.balance
-        
         try:
-            wallet.withdraw(amount)
+            old_balance = Portfolio.apply_withdraw(portfolio_data, currency, amount)
         except InsufficientFundsError as e:
             print(str(e))
             return
+        new_balance = portfolio_data['wallets'][currency]['balance']
         
         # Сохранение изменений
-        portfolio_data = portfolio.to_dict()
-        for i, p in enumerate(portfolios):
-            if p['user_id'] == state.current_user.user_id:
-                portfolios[i] = portfolio_data
-                break
-        
-        save_portfolios(state.data_dir, portfolios)
+        save_portfolios(state, portfolios, state.current_user.user_id)
         
         # Вывод результата
         if rate > 0:
@@ -451,7 +717,7 @@ def sell_command(args: Dict[str, Any], state: CLIState):
             print(f"Продажа выполнена: {amount:.4f} {currency}")
         
         print("Изменения в портфеле:")
-        print(f"- {currency}: было {old_balance:.4f} → стало {wallet.balance:.4f}")
+        print(f"- {currency}: было {old_balance:.4f} → стало {new_balance:.4f}")
         
     except CurrencyNotFoundError as e:
         print(str(e))
@@ -473,19 +739,16 @@ def get_rate_command(args: Dict[str, Any], state: CLIState):
             print("Ошибка: необходимо указать --from и --to")
             return
         
-        # Валидация через usecases
-        rate, updated_at = usecases.get_exchange_rate(from_currency, to_currency)
+        # Валидация через usecases (возвращает нормализованные коды валют)
+        rate, updated_at, from_currency, to_currency = usecases.get_exchange_rate(from_currency, to_currency)
         
         # Валидация кодов валют
-        from_currency = from_currency.upper().strip()
-        to_currency = to_currency.upper().strip()
-        
         if not from_currency or not to_currency:
             print("Коды валют не могут быть пустыми")
             return
         
         # Загрузка курсов
-        rates = load_rates(state.data_dir)
+        rates = load_rates(state)
         
         # Поиск прямого курса
         rate_key = f"{from_currency}_{to_currency}"
@@ -539,16 +802,29 @@ def get_rate_command(args: Dict[str, Any], state: CLIState):
     except CurrencyNotFoundError as e:
         print(str(e))
         print("Используйте 'help get-rate' или проверьте список доступных валют")
-        available_currencies = list(get_all_currencies().keys())
-        print(f"Доступные валюты: {', '.join(available_currencies)}")
+        print(f"Доступные валюты: {AVAILABLE_CURRENCIES_CSV}")
         
     except Exception as e:
         print(f"Ошибка при получении курса: {e}")
 
 
+# Таблица команд CLI (имя команды -> обработчик)
+_COMMANDS = {
+    'register': register_command,
+    'login': login_command,
+    'show-portfolio': show_portfolio_command,
+    'buy': buy_command,
+    'sell': sell_command,
+    'get-rate': get_rate_command,
+}
+
+_HELP_ALIASES = frozenset({'help', '--help', '-h'})
+
+
 def interactive_mode():
     """Интерактивный режим с циклом while."""
     state = CLIState()
+    state.defer_writes = True
     
     print("Добро пожаловать в ValutaTrade Hub!")
     print("Введите 'help' для списка команд, 'exit' для выхода")
@@ -565,9 +841,9 @@ def interactive_mode():
                 print("Выход из ValutaTrade Hub. До свидания!")
                 break
             
-            # Парсинг введенной команды с помощью shlex
+            # Парсинг введенной команды
             try:
-                args_list = shlex.split(user_input)
+                args_list = _fast_split(user_input)
             except ValueError as e:
                 print(f"Ошибка парсинга команды: {e}")
                 continue
@@ -576,19 +852,10 @@ def interactive_mode():
             command = args.get('command')
             
             # Выполнение команды
-            if command == 'register':
-                register_command(args, state)
-            elif command == 'login':
-                login_command(args, state)
-            elif command == 'show-portfolio':
-                show_portfolio_command(args, state)
-            elif command == 'buy':
-                buy_command(args, state)
-            elif command == 'sell':
-                sell_command(args, state)
-            elif command == 'get-rate':
-                get_rate_command(args, state)
-            elif command in ['help', '--help', '-h']:
+            handler = _COMMANDS.get(command)
+            if handler is not None:
+                handler(args, state)
+            elif command in _HELP_ALIASES:
                 print_help()
             else:
                 print(f"Неизвестная команда: {command}")
@@ -602,6 +869,12 @@ def interactive_mode():
             break
         except Exception as e:
             print(f"Неожиданная ошибка: {e}")
+    
+    # Запись отложенных изменений портфелей перед выходом
+    try:
+        flush_portfolios(state)
+    except Exception as e:
+        print(f"Ошибка при сохранении портфелей: {e}")
 
 
 def main():
@@ -613,10 +886,10 @@ def main():
         # Старый режим с аргументами командной строки
         state = CLIState()
         
-        # Парсинг аргументов с помощью shlex (для корректной обработки кавычек)
+        # Парсинг аргументов (с корректной обработкой кавычек)
         command_line = ' '.join(sys.argv[1:])
         try:
-            args_list = shlex.split(command_line)
+            args_list = _fast_split(command_line)
         except ValueError as e:
             print(f"Ошибка парсинга команд: {e}")
             return
@@ -625,19 +898,10 @@ def main():
         command = args.get('command')
         
         # Выполнение команды
-        if command == 'register':
-            register_command(args, state)
-        elif command == 'login':
-            login_command(args, state)
-        elif command == 'show-portfolio':
-            show_portfolio_command(args, state)
-        elif command == 'buy':
-            buy_command(args, state)
-        elif command == 'sell':
-            sell_command(args, state)
-        elif command == 'get-rate':
-            get_rate_command(args, state)
-        elif command in ['help', '--help', '-h']:
+        handler = _COMMANDS.get(command)
+        if handler is not None:
+            handler(args, state)
+        elif command in _HELP_ALIASES:
             print_help()
         else:
             print(f"Неизвестная команда: {command}")
@@ -1,5 +1,7 @@
+import sys
 from abc import ABC, abstractmethod
-from typing import Dict
+from types import MappingProxyType
+from typing import Dict, Mapping
 
 from ..core.exceptions import CurrencyNotFoundError
 
@@ -7,6 +9,8 @@ from ..core.exceptions import CurrencyNotFoundError
 class Currency(ABC):
     """Абстрактный базовый класс для валют."""
     
+    __slots__ = ('name', 'code')
+    
     def __init__(self, name: str, code: str):
         """
         Инициализация валюты.
@@ -19,7 +23,13 @@ class Currency(ABC):
         self._validate_name(name)
         
         self.name = name
-        self.code = code
+        # Интернирование: сравнение с кодами из реестра сводится к сравнению ссылок
+        self.code = sys.intern(code)
+    
+    def _init_trusted(self, name: str, code: str) -> None:
+        """Установка базовых атрибутов без валидации (только для данных реестра)."""
+        self.name = name
+        self.code = sys.intern(code)
     
     def _validate_code(self, code: str) -> None:
         """Валидация кода валюты."""
@@ -59,6 +69,8 @@ class Currency(ABC):
 class FiatCurrency(Currency):
     """Класс для фиатных валют."""
     
+    __slots__ = ('issuing_country',)
+    
     def __init__(self, name: str, code: str, issuing_country: str):
         """
         Инициализация фиатной валюты.
@@ -71,6 +83,24 @@ class FiatCurrency(Currency):
         super().__init__(name, code)
         self.issuing_country = issuing_country
     
+    @classmethod
+    def _trusted(cls, name: str, code: str, issuing_country: str) -> 'FiatCurrency':
+        """
+        Создание фиатной валюты без валидации (только для данных реестра).
+        
+        Args:
+            name: Человекочитаемое имя
+            code: ISO-код
+            issuing_country: Страна/зона эмиссии
+            
+        Returns:
+            Объект FiatCurrency
+        """
+        currency = cls.__new__(cls)
+        currency._init_trusted(name, code)
+        currency.issuing_country = issuing_country
+        return currency
+    
     def get_display_info(self) -> str:
         """
         Строковое представление фиатной валюты.
@@ -87,6 +117,8 @@ class FiatCurrency(Currency):
 class CryptoCurrency(Currency):
     """Класс для криптовалют."""
     
+    __slots__ = ('algorithm', '_market_cap', '_mcap_display')
+    
     def __init__(self, name: str, code: str, algorithm: str, market_cap: float = 0.0):
         """
         Инициализация криптовалюты.
@@ -101,6 +133,37 @@ class CryptoCurrency(Currency):
         self.algorithm = algorithm
         self.market_cap = market_cap
     
+    @classmethod
+    def _trusted(cls, name: str, code: str, algorithm: str, market_cap: float = 0.0) -> 'CryptoCurrency':
+        """
+        Создание криптовалюты без валидации (только для данных реестра).
+        
+        Args:
+            name: Человекочитаемое имя
+            code: Тикер
+            algorithm: Алгоритм
+            market_cap: Рыночная капитализация (по умолчанию 0.0)
+            
+        Returns:
+            Объект CryptoCurrency
+        """
+        currency = cls.__new__(cls)
+        currency._init_trusted(name, code)
+        currency.algorithm = algorithm
+        currency.market_cap = market_cap
+        return currency
+    
+    @property
+    def market_cap(self) -> float:
+        """Геттер для рыночной капитализации."""
+        return self._market_cap
+    
+    @market_cap.setter
+    def market_cap(self, value: float) -> None:
+        """Сеттер для рыночной капитализации (обновляет строку для отображения)."""
+        self._market_cap = value
+        self._mcap_display = f"{value:.2e}" if value > 1e9 else f"{value:,.2f}"
+    
     def get_display_info(self) -> str:
         """
         Строковое представление криптовалюты.
@@ -108,8 +171,7 @@ class CryptoCurrency(Currency):
         Returns:
             Строка в формате: "[CRYPTO] BTC — Bitcoin (Algo: SHA-256, MCAP: 1.12e12)"
         """
-        mcap_display = f"{self.market_cap:.2e}" if self.market_cap > 1e9 else f"{self.market_cap:,.2f}"
-        return f"[CRYPTO] {self.code} — {self.name} (Algo: {self.algorithm}, MCAP: {mcap_display})"
+        return f"[CRYPTO] {self.code} — {self.name} (Algo: {self.algorithm}, MCAP: {self._mcap_display})"
     
     def __repr__(self) -> str:
         return f"CryptoCurrency(code='{self.code}', name='{self.name}', algorithm='{self.algorithm}', market_cap={self.market_cap})"
@@ -118,29 +180,46 @@ class CryptoCurrency(Currency):
 # Реестр валют
 _currency_registry: Dict[str, Currency] = {}
 
+# Представление реестра только для чтения (без копирования)
+_currency_registry_view: Mapping[str, Currency] = MappingProxyType(_currency_registry)
+
+# Количество валют по типам (реестр не меняется после инициализации)
+_currency_type_counts: Dict[str, int] = {}
+
 
 def _initialize_currencies():
     """Инициализация реестра валют."""
+    # Данные реестра заведомо корректны, поэтому создаются без валидации
     # Фиатные валюты
     fiats = [
-        FiatCurrency("US Dollar", "USD", "United States"),
-        FiatCurrency("Euro", "EUR", "Eurozone"),
-        FiatCurrency("Russian Ruble", "RUB", "Russia"),
-        FiatCurrency("British Pound", "GBP", "United Kingdom"),
-        FiatCurrency("Japanese Yen", "JPY", "Japan"),
+        FiatCurrency._trusted("US Dollar", "USD", issuing_country="United States"),
+        FiatCurrency._trusted("Euro", "EUR", issuing_country="Eurozone"),
+        FiatCurrency._trusted("Russian Ruble", "RUB", issuing_country="Russia"),
+        FiatCurrency._trusted("British Pound", "GBP", issuing_country="United Kingdom"),
+        FiatCurrency._trusted("Japanese Yen", "JPY", issuing_country="Japan"),
     ]
     
     # Криптовалюты
     cryptos = [
-        CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12),
-        CryptoCurrency("Ethereum", "ETH", "Ethash", 3.5e11),
-        CryptoCurrency("Litecoin", "LTC", "Scrypt", 5.8e9),
-        CryptoCurrency("Cardano", "ADA", "Ouroboros", 1.2e10),
+        CryptoCurrency._trusted("Bitcoin", "BTC", algorithm="SHA-256", market_cap=1.12e12),
+        CryptoCurrency._trusted("Ethereum", "ETH", algorithm="Ethash", market_cap=3.5e11),
+        CryptoCurrency._trusted("Litecoin", "LTC", algorithm="Scrypt", market_cap=5.8e9),
+        CryptoCurrency._trusted("Cardano", "ADA", algorithm="Ouroboros", market_cap=1.2e10),
     ]
     
     # Добавляем все валюты в реестр
     for currency in fiats + cryptos:
         _currency_registry[currency.code] = currency
+    
+    # Подсчёт по итоговому реестру (дубликаты кодов не учитываются дважды)
+    counts = {"fiat": 0, "crypto": 0}
+    for currency in _currency_registry.values():
+        if isinstance(currency, FiatCurrency):
+            counts["fiat"] += 1
+        elif isinstance(currency, CryptoCurrency):
+            counts["crypto"] += 1
+    _currency_type_counts.clear()
+    _currency_type_counts.update(counts)
 
 
 def get_currency(code: str) -> Currency:
@@ -158,26 +237,21 @@ def get_currency(code: str) -> Currency:
     """
     code = code.upper().strip()
     
-    if not _currency_registry:
-        _initialize_currencies()
-    
-    if code not in _currency_registry:
+    currency = _currency_registry.get(code)
+    if currency is None:
         raise CurrencyNotFoundError(code)
     
-    return _currency_registry[code]
+    return currency
 
 
-def get_all_currencies() -> Dict[str, Currency]:
+def get_all_currencies() -> Mapping[str, Currency]:
     """
     Получить все доступные валюты.
     
     Returns:
-        Словарь всех валют (код -> объект Currency)
+        Представление реестра только для чтения (код -> объект Currency)
     """
-    if not _currency_registry:
-        _initialize_currencies()
-    
-    return _currency_registry.copy()
+    return _currency_registry_view
 
 
 def get_currency_types_count() -> Dict[str, int]:
@@ -187,18 +261,11 @@ def get_currency_types_count() -> Dict[str, int]:
     Returns:
         Словарь с количеством валют каждого типа
     """
-    if not _currency_registry:
-        _initialize_currencies()
-    
-    counts = {"fiat": 0, "crypto": 0}
-    for currency in _currency_registry.values():
-        if isinstance(currency, FiatCurrency):
-            counts["fiat"] += 1
-        elif isinstance(currency, CryptoCurrency):
-            counts["crypto"] += 1
-    
-    return counts
+    return dict(_currency_type_counts)
 
 
 # Инициализируем реестр при импорте модуля
-_initialize_currencies()
\ No newline at end of file
+_initialize_currencies()
+
+# Список кодов валют через запятую (для сообщений об ошибках)
+AVAILABLE_CURRENCIES_CSV = ', '.join(_currency_registry)
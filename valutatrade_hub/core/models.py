@@ -1,12 +1,16 @@
 import hashlib
 import secrets
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
+
+from .exceptions import InsufficientFundsError
 
 
 class User:
     """Класс пользователя системы с аутентификацией и валидацией."""
     
+    __slots__ = ('_user_id', '_username', '_registration_date', '_salt', '_hashed_password')
+    
     def __init__(self, user_id: int, username: str, password: str, 
                  registration_date: datetime = None, salt: str = None, 
                  hashed_password: str = None):
@@ -191,6 +195,8 @@ class User:
 class Wallet:
     """Класс кошелька пользователя для одной конкретной валюты."""
     
+    __slots__ = ('_currency_code', '_balance')
+    
     def __init__(self, currency_code: str, balance: float = 0.0):
         """
         Инициализация кошелька.
@@ -288,6 +294,36 @@ class Wallet:
         """
         return f"{self.currency_code}: {self._balance:.4f}"
     
+    @classmethod
+    def acquire(cls, currency_code: str, balance: float = 0.0) -> 'Wallet':
+        """
+        Получение кошелька из пула (или создание нового, если пул пуст).
+        
+        Args:
+            currency_code: Код валюты
+            balance: Начальный баланс
+            
+        Returns:
+            Объект Wallet
+        """
+        if not _wallet_pool:
+            return cls(currency_code, balance)
+        
+        wallet = _wallet_pool.pop()
+        wallet.currency_code = currency_code
+        wallet.balance = balance
+        return wallet
+    
+    @staticmethod
+    def release(wallet: 'Wallet') -> None:
+        """
+        Возврат кошелька в пул для повторного использования.
+        
+        Args:
+            wallet: Кошелёк, который больше не используется
+        """
+        if len(_wallet_pool) < _WALLET_POOL_SIZE:
+            _wallet_pool.append(wallet)
     
     def to_dict(self) -> dict:
         """
@@ -313,7 +349,7 @@ class Wallet:
         Returns:
             Объект Wallet
         """
-        return cls(
+        return cls.acquire(
             currency_code=data["currency_code"],
             balance=data["balance"]
         )
@@ -325,10 +361,18 @@ class Wallet:
     def __repr__(self) -> str:
         """Представление для отладки."""
         return f"Wallet(currency_code='{self.currency_code}', balance={self._balance})"
-    
+
+
+# Пул свободных кошельков для повторного использования между командами
+_WALLET_POOL_SIZE = 64
+_wallet_pool: List[Wallet] = []
+
+
 class Portfolio:
     """Класс для управления всеми кошельками одного пользователя."""
     
+    __slots__ = ('_user_id', '_wallets', '_display_cache')
+    
     def __init__(self, user_id: int, wallets: Dict[str, 'Wallet'] = None):
         """
         Инициализация портфеля.
@@ -339,6 +383,8 @@ class Portfolio:
         """
         self._user_id = user_id
         self._wallets = wallets if wallets is not None else {}
+        # Кэш строк для вывода портфеля: (базовая валюта, [(код, ключ курса, кошелёк)])
+        self._display_cache: Optional[Tuple[str, List[Tuple[str, Tuple[str, str], 'Wallet']]]] = None
     
     @property
     def user_id(self) -> int:
@@ -379,8 +425,9 @@ class Portfolio:
         if currency_code in self._wallets:
             raise ValueError(f"Валюта '{currency_code}' уже существует в портфеле")
         
-        wallet = Wallet(currency_code, initial_balance)
+        wallet = Wallet.acquire(currency_code, initial_balance)
         self._wallets[currency_code] = wallet
+        self._display_cache = None
         return wallet
     
     def get_wallet(self, currency_code: str) -> Optional['Wallet']:
@@ -551,6 +598,7 @@ class Portfolio:
         currency_code = currency_code.upper()
         if currency_code in self._wallets:
             del self._wallets[currency_code]
+            self._display_cache = None
             return True
         return False
     
@@ -563,6 +611,31 @@ class Portfolio:
         """
         return list(self._wallets.keys())
     
+    def release(self) -> None:
+        """Возвращает все кошельки портфеля в пул и очищает портфель."""
+        for wallet in self._wallets.values():
+            Wallet.release(wallet)
+        self._wallets.clear()
+        self._display_cache = None
+    
+    def get_display_items(self, base_currency: str = 'USD') -> List[Tuple[str, Tuple[str, str], 'Wallet']]:
+        """
+        Возвращает кошельки для вывода портфеля (список кэшируется).
+        
+        Args:
+            base_currency: Базовая валюта для ключей курсов
+            
+        Returns:
+            Список кортежей (код валюты, ключ курса (код, база), кошелёк)
+        """
+        if self._display_cache is None or self._display_cache[0] != base_currency:
+            items = [
+                (currency_code, (currency_code, base_currency), wallet)
+                for currency_code, wallet in self._wallets.items()
+            ]
+            self._display_cache = (base_currency, items)
+        return self._display_cache[1]
+    
 
     def to_dict(self) -> dict:
         """
@@ -601,6 +674,74 @@ class Portfolio:
             wallets=wallets
         )
     
+    @staticmethod
+    def apply_deposit(portfolio_data: dict, currency_code: str, amount: float) -> float:
+        """
+        Пополнение кошелька прямо в словаре портфеля (без создания объектов).
+        
+        Args:
+            portfolio_data: Данные портфеля (как в JSON)
+            currency_code: Код валюты (кошелёк создаётся, если его нет)
+            amount: Сумма для пополнения
+            
+        Returns:
+            Баланс кошелька до операции
+            
+        Raises:
+            ValueError: Если сумма не положительная
+        """
+        if not isinstance(amount, (int, float)):
+            raise ValueError("Сумма пополнения должна быть числом")
+        if amount <= 0:
+            raise ValueError("Сумма пополнения должна быть положительной")
+        
+        wallets = portfolio_data["wallets"]
+        wallet_data = wallets.get(currency_code)
+        if wallet_data is None:
+            wallet_data = wallets[currency_code] = {
+                "currency_code": currency_code,
+                "balance": 0.0
+            }
+        
+        old_balance = wallet_data["balance"]
+        wallet_data["balance"] = float(old_balance + amount)
+        return old_balance
+    
+    @staticmethod
+    def apply_withdraw(portfolio_data: dict, currency_code: str, amount: float) -> float:
+        """
+        Снятие средств прямо в словаре портфеля (без создания объектов).
+        
+        Args:
+            portfolio_data: Данные портфеля (как в JSON)
+            currency_code: Код валюты
+            amount: Сумма для снятия
+            
+        Returns:
+            Баланс кошелька до операции
+            
+        Raises:
+            ValueError: Если сумма не положительная
+            InsufficientFundsError: Если недостаточно средств
+        """
+        if not isinstance(amount, (int, float)):
+            raise ValueError("Сумма снятия должна быть числом")
+        if amount <= 0:
+            raise ValueError("Сумма снятия должна быть положительной")
+        
+        wallet_data = portfolio_data["wallets"].get(currency_code)
+        old_balance = wallet_data["balance"] if wallet_data is not None else 0.0
+        
+        if wallet_data is None or amount > old_balance:
+            raise InsufficientFundsError(
+                available=old_balance,
+                required=amount,
+                currency_code=currency_code
+            )
+        
+        wallet_data["balance"] = float(old_balance - amount)
+        return old_balance
+    
     def __str__(self) -> str:
         """Строковое представление портфеля."""
         currencies = ", ".join(self._wallets.keys())
@@ -45,7 +45,7 @@ class UseCases:
         # Возвращаем данные для лога
         return {
             'user_id': user_id,
-            'currency': currency_code,
+            'currency': currency_obj.code,
             'amount': amount,
             'rate': 59300.00,  # Пример курса
             'base': 'USD'
@@ -65,24 +65,26 @@ class UseCases:
         # Возвращаем данные для лога
         return {
             'user_id': user_id,
-            'currency': currency_code,
+            'currency': currency_obj.code,
             'amount': amount,
             'rate': 59800.00,  # Пример курса
             'base': 'USD'
         }
     
     @log_get_rate
-    def get_exchange_rate(self, from_currency: str, to_currency: str) -> Tuple[float, str]:
+    def get_exchange_rate(self, from_currency: str, to_currency: str) -> Tuple[float, str, str, str]:
         """
         Получение курса валюты с валидацией через currencies.py.
+        
+        Возвращает курс, время обновления и нормализованные коды валют.
         """
         # Валидация валют
         from_currency_obj = get_currency(from_currency)
         to_currency_obj = get_currency(to_currency)
         
         # Заглушка - возвращаем фиксированный курс
-        rate = 59300.0 if to_currency == 'BTC' else 1.08
-        return rate, datetime.now().isoformat()
+        rate = 59300.0 if to_currency_obj.code == 'BTC' else 1.08
+        return rate, datetime.now().isoformat(), from_currency_obj.code, to_currency_obj.code
 
 
 # Глобальный экземпляр